@@ -9,16 +9,30 @@
 '''
 
 import os
+import sys
+import array
+import bisect
 import hashlib
 import html
+import functools
+import concurrent.futures
 
 import autoarchaeologist.excavation as excavation
 import autoarchaeologist.record as record
 import autoarchaeologist.scattergather as scattergather
 
+# create_batch() only bothers with threads above this many bytes
+BATCH_THRESHOLD = 1 << 20
+
 class DuplicateName(Exception):
     ''' Set names must be unique '''
 
+def sha256(bits):
+    ''' SHA256 digest of a buffer or ScatterGather '''
+    if isinstance(bits, scattergather.ScatterGather):
+        return bits.sha256()
+    return hashlib.sha256(scattergather.contiguous(bits)).digest()
+
 class Utf8Interpretation():
     '''
        Some examinations output a UTF8 representation, containing
@@ -75,7 +89,8 @@ class ArtifactClass():
         else:
             self.bdx = memoryview(bits)
 
-        self.digest = digest
+        self.digest_bytes = digest
+        self._hash = int.from_bytes(digest[:8], 'big')
 
         self.parents = []
         self.children = []
@@ -85,10 +100,16 @@ class ArtifactClass():
         self.unique = 0
         self.notes = set()
         self.types = set()
+        self.types_recursive = None
+        self.notes_recursive = None
+        self.notes_sorted = None
         self.descriptions = []
         self.comments = []
         self.taken = False
-        self.layout = []
+        # Layout of children, sorted by (start, stop)
+        self.layout_starts = array.array('Q')
+        self.layout_stops = array.array('Q')
+        self.layout_children = []
 
         self.type_case = None
 
@@ -97,6 +118,7 @@ class ArtifactClass():
         self.top.add_artifact(self)
 
         self.index_representation = None
+        self.derivation = None
         self.link_to = ""
 
         self.by_class = {} # Experimental extension point
@@ -111,7 +133,7 @@ class ArtifactClass():
         return len(self.bdx)
 
     def __hash__(self):
-        return int(self.digest[:8], 16)
+        return self._hash
 
     def __getitem__(self, idx):
         return self.bdx[idx]
@@ -122,7 +144,12 @@ class ArtifactClass():
         return self.name() < other.name()
 
     def __iter__(self):
-        yield from self.bdx
+        return iter(self.bdx)
+
+    @functools.cached_property
+    def digest(self):
+        ''' Hexadecimal SHA256 digest, for names and filenames '''
+        return self.digest_bytes.hex()
 
     def get_unique(self):
         ''' Return a unique (increasing) number '''
@@ -161,21 +188,31 @@ class ArtifactClass():
         assert self != parent
         self.parents.append(parent)
         parent.children.append(self)
+        parent.forget_recursive()
+
+    def forget_recursive(self):
+        ''' Invalidate cached recursive types & notes, here and upwards '''
+        if self.types_recursive is None and self.notes_recursive is None:
+            return
+        self.types_recursive = None
+        self.notes_recursive = None
+        self.notes_sorted = None
+        for p in self.parents:
+            p.forget_recursive()
 
     def set_name(self, name, fallback=True):
         ''' Set a unique name '''
+        name = sys.intern(name)
         if self.named == name:
             return
         if self.named is not None:
             if fallback:
                 self.add_note(name)
-                self.top.add_to_index(name, self)
                 return
             raise DuplicateName("Name clash '%s' vs '%s'" % (self.named, name))
         if name in self.top.names:
             if fallback:
                 self.add_note(name)
-                self.top.add_to_index(name, self)
                 return
             raise DuplicateName("Name already used '%s'" % name)
         self.top.names.add(name)
@@ -184,7 +221,11 @@ class ArtifactClass():
 
     def add_type(self, typ):
         ''' Add type designation (also as note) '''
+        typ = sys.intern(typ)
+        if typ in self.types:
+            return
         self.types.add(typ)
+        self.forget_recursive()
         self.top.add_to_index(typ, self)
 
     def has_type(self, note):
@@ -206,10 +247,15 @@ class ArtifactClass():
         ''' Add a comment '''
         self.comments.append(desc)
         self.notes.add("Has Comment")
+        self.forget_recursive()
 
     def add_note(self, note):
         ''' Add a note '''
+        note = sys.intern(note)
+        if note in self.notes:
+            return
         self.notes.add(note)
+        self.forget_recursive()
         self.top.add_to_index(note, self)
 
     def has_note(self, note):
@@ -218,19 +264,44 @@ class ArtifactClass():
 
     def iter_types(self, recursive=False):
         ''' Return all notes that apply to this artifact '''
-        yield from self.types
         if recursive:
+            yield from self.types_recursive_tuple()
+        else:
+            yield from self.types
+
+    def types_recursive_tuple(self):
+        ''' Return (cached) deduplicated types of this artifact and its children '''
+        if self.types_recursive is None:
+            lst = list(self.types)
             for child in self.children:
                 assert child != self, (child, self)
-                yield from child.iter_types(recursive)
+                lst += child.types_recursive_tuple()
+            self.types_recursive = tuple(dict.fromkeys(lst))
+        return self.types_recursive
 
     def iter_notes(self, recursive=False):
         ''' Return all notes that apply to this artifact '''
-        yield from [(self, i) for i in self.notes]
         if recursive:
+            yield from self.notes_recursive_tuple()
+        else:
+            for i in self.notes:
+                yield (self, i)
+
+    def notes_recursive_tuple(self):
+        ''' Return (cached) (artifact, note) pairs of this artifact and its children '''
+        if self.notes_recursive is None:
+            lst = [(self, i) for i in self.notes]
             for child in self.children:
                 assert child != self, (child, self)
-                yield from child.iter_notes(recursive)
+                lst += child.notes_recursive_tuple()
+            self.notes_recursive = tuple(lst)
+        return self.notes_recursive
+
+    def sorted_notes(self):
+        ''' Return the sorted names of all notes, recursively '''
+        if self.notes_sorted is None:
+            self.notes_sorted = sorted({y for _x, y in self.notes_recursive_tuple()})
+        return self.notes_sorted
 
     def record(self, layout, **kwargs):
         ''' Extract a compound record '''
@@ -252,20 +323,44 @@ class ArtifactClass():
         ''' Return a new or old artifact for some bits '''
         if records:
             assert bits is None
-            assert len(records) > 0
-            bits = scattergather.ScatterGather(records)
-            digest = bits.sha256()
-        elif isinstance(bits, memoryview):
-            digest = hashlib.sha256(bits.tobytes()).hexdigest()
-        elif bits:
-            digest = hashlib.sha256(bits).hexdigest()
-        else:
-            assert stop > start
-            assert stop <= len(self)
-            if not start and stop == len(self):
-                return self
-            bits = self[start:stop]
-            digest = hashlib.sha256(bits.tobytes()).hexdigest()
+            return self.create_from_records(records, start, stop)
+        if isinstance(bits, memoryview) or bits:
+            return self.create_from_buffer(bits, start, stop)
+        return self.create_slice(start, stop)
+
+    def create_from_records(self, records, start=None, stop=None):
+        ''' Return a new or old artifact for a list of records '''
+        assert len(records) > 0
+        if self.is_all_of(records):
+            return self
+        bits = scattergather.ScatterGather(records)
+        return self.create_from_digest(bits.sha256(), bits, start, stop)
+
+    def create_from_buffer(self, bits, start=None, stop=None):
+        ''' Return a new or old artifact for a memoryview or bytes-like bits '''
+        if self.is_all_of(bits):
+            return self
+        return self.create_from_digest(sha256(bits), bits, start, stop)
+
+    def create_slice(self, start, stop, digest=None):
+        ''' Return a new or old artifact for a slice of this one '''
+        assert stop > start
+        assert stop <= len(self)
+        if not start and stop == len(self):
+            return self
+        key = (self, start, stop)
+        this = self.top.slices.get(key)
+        if this:
+            return this
+        bits = self[start:stop]
+        if digest is None:
+            digest = sha256(bits)
+        this = self.create_from_digest(digest, bits, start, stop)
+        self.top.slices[key] = this
+        return this
+
+    def create_from_digest(self, digest, bits, start=None, stop=None):
+        ''' Return the artifact with this digest, creating it if need be '''
         this = self.top.hashes.get(digest)
         if not this:
             this = ArtifactClass(self, digest, bits)
@@ -273,17 +368,81 @@ class ArtifactClass():
         else:
             this.add_parent(self)
         if start or stop:
-            self.layout.append((start, stop, this))
+            self.add_layout(start, stop, this)
         return this
 
+    def is_all_of(self, bits):
+        '''
+           Are bits (or records) trivially all of this artifact ?
+
+           Only identity is checked, not contents, so that a
+           re-wrap of our own buffer need not be hashed.
+        '''
+        if bits is self.bdx:
+            return True
+        if isinstance(self.bdx, scattergather.ScatterGather):
+            sgx = self.bdx.sgx
+            return (
+                isinstance(bits, (list, tuple)) and
+                len(bits) == len(sgx) and
+                all(x is y for x, y in zip(bits, sgx))
+            )
+        # A contiguous view as large as its object must start at offset zero
+        mine = self.bdx
+        obj = mine.obj
+        if not mine.c_contiguous or mine.nbytes != memoryview(obj).nbytes:
+            return False
+        if isinstance(bits, memoryview):
+            return (
+                bits.obj is obj and
+                bits.c_contiguous and
+                bits.format == mine.format and
+                bits.nbytes == mine.nbytes
+            )
+        return bits is obj
+
+    def add_layout(self, start, stop, this):
+        ''' Record where a child lives in this artifact '''
+        if start is None or stop is None:
+            return
+        lo = bisect.bisect_left(self.layout_starts, start)
+        hi = bisect.bisect_right(self.layout_starts, start, lo)
+        idx = bisect.bisect_right(self.layout_stops, stop, lo, hi)
+        self.layout_starts.insert(idx, start)
+        self.layout_stops.insert(idx, stop)
+        self.layout_children.insert(idx, this)
+
+    def iter_layout(self):
+        ''' Yield (start, stop, child) in order '''
+        yield from zip(self.layout_starts, self.layout_stops, self.layout_children)
+
+    def create_batch(self, slices):
+        '''
+           Return new or old artifacts for a list of (start, stop) slices
+
+           The slices are hashed in parallel threads, hashlib releases
+           the GIL on large buffers, and then created in order.
+        '''
+        todo = [
+            (start, stop) for start, stop in slices
+            if (start or stop != len(self))
+            and (self, start, stop) not in self.top.slices
+        ]
+        digests = {}
+        if len(todo) > 1 and sum(y - x for x, y in todo) >= BATCH_THRESHOLD:
+            with concurrent.futures.ThreadPoolExecutor() as pool:
+                digests = dict(zip(todo, pool.map(lambda x: sha256(self[x[0]:x[1]]), todo)))
+        return [
+            self.create_slice(start, stop, digests.get((start, stop)))
+            for start, stop in slices
+        ]
+
     def examined(self):
         ''' Examination of this artifact is complete '''
         # XXX: create left over slices
         lst = []
         offset = 0
-        for start, stop, _src in sorted(self.layout):
-            if start is None or stop is None:
-                continue
+        for start, stop in zip(self.layout_starts, self.layout_stops):
             if offset < start:
                 lst.append((offset, start))
             offset = stop
@@ -291,8 +450,7 @@ class ArtifactClass():
             return
         if offset != len(self):
             lst.append((offset, len(self)))
-        for start, stop in lst:
-            self.create(start=start, stop=stop)
+        self.create_batch(lst)
 
     def summary(self, link=True, ident=True, notes=False):
         ''' Produce a one-line summary '''
@@ -304,15 +462,11 @@ class ArtifactClass():
                     nam = self.top.html_link_to(self) + " "
                 else:
                     nam = self.name() + " "
-            j = set()
-            for i in sorted(self.iter_types(True)):
-                if i not in j:
-                    txt.append(i)
-                    j.add(i)
+            txt += sorted(self.iter_types(True))
             if self.descriptions:
                 txt += sorted(self.descriptions)
             if notes:
-                txt += excavation.dotdotdot(sorted({y for _x, y in self.iter_notes(True)}))
+                txt += excavation.dotdotdot(self.sorted_notes())
             if not link or not ident:
                 return nam + ", ".join(txt)
             self.index_representation = nam + ", ".join(txt)
@@ -328,7 +482,7 @@ class ArtifactClass():
         if self.types:
             fo.write("    Types: " + ", ".join(sorted(self.types)) + "\n")
         if self.notes:
-            fo.write("    Notes: " + ", ".join(sorted({y for x, y in self.iter_notes(True)}))+ "\n")
+            fo.write("    Notes: " + ", ".join(self.sorted_notes()) + "\n")
         fo.write("</pre>\n")
 
         fo.write("<H4>Derivation</H4>\n")
@@ -362,7 +516,7 @@ class ArtifactClass():
 
         fo.write("<H4>Children</H4>\n")
         fo.write("<pre>\n")
-        for start, stop, this in sorted(self.layout):
+        for start, stop, this in self.iter_layout():
             fo.write("  0x%08x" % start + "-0x%08x  " % stop)
             fo.write(this.summary() + "\n")
         fo.write("</pre>\n")
@@ -385,18 +539,36 @@ class ArtifactClass():
             done = 0
             for n, r in enumerate(self.iterrecords()):
                 fo.write("Record #0x%x\n" % n)
-                self.type_case.hexdump_html(r.tobytes(), fo)
+                self.type_case.hexdump_html(r, fo)
                 fo.write("\n")
                 done += len(r)
                 if done > self.top.hexdump_limit:
                     break
 
     def html_derivation(self, fo):
-        ''' Recursively document how this artifact came to be '''
+        ''' Document how this artifact came to be '''
+        # Render each ancestor once, parents before children, without recursion
+        stack = [self]
+        while stack:
+            this = stack[-1]
+            if this.derivation is not None:
+                stack.pop()
+                continue
+            todo = [p for p in this.parents if p.derivation is None]
+            if todo:
+                stack += todo
+                continue
+            stack.pop()
+            this.render_derivation()
+        fo.write(self.derivation[0])
+
+    def render_derivation(self):
+        ''' Derivation text and prefix, given those of our parents '''
+        txt = []
         prefix = ""
         for p in sorted(self.parents):
-            t = p.html_derivation(fo)
+            ptxt, t = p.derivation
             if len(t) > len(prefix):
                 prefix = t
-            fo.write(t + "└─" + self.summary() + '\n')
-        return prefix + "    "
+            txt.append(ptxt + t + "└─" + self.summary() + '\n')
+        self.derivation = ("".join(txt), prefix + "    ")
@@ -175,7 +175,7 @@ class RelBin():
             this.add_type("RelBinLib")
             offset = 0
             for a, b, _r in objs:
-                this.create(start=offset+a, stop=offset+a+b)
+                this.create_slice(offset+a, offset+a+b)
                 offset += a + b
             return
 
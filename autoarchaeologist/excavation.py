@@ -103,6 +103,7 @@ class Excavation():
         self.link_prefix = link_prefix
 
         self.hashes = {}
+        self.slices = {}   # (parent, start, stop) -> artifact
         self.busy = True
         self.queue = []
         self.examiners = []
@@ -113,6 +114,7 @@ class Excavation():
         # Duck-type as ArtifactClass
         self.top = self
         self.children = []
+        self.derivation = ("", "")   # Text & prefix, see ArtifactClass.html_derivation()
         self.by_class = {} # Experimental extension point
 
         # Default character set
@@ -125,8 +127,8 @@ class Excavation():
     def add_artifact(self, this):
         ''' Add an artifact, and start examining it '''
         assert isinstance(this, artifact.ArtifactClass)
-        assert this.digest not in self.hashes
-        self.hashes[this.digest] = this
+        assert this.digest_bytes not in self.hashes
+        self.hashes[this.digest_bytes] = this
         self.queue.append(this)
         if this.type_case is None:
             this.type_case = self.type_case
@@ -143,7 +145,7 @@ class Excavation():
         if not description:
             description = "Top-level Artifact"
 
-        digest = hashlib.sha256(bits).hexdigest()
+        digest = hashlib.sha256(bits).digest()
 
         this = self.hashes.get(digest)
         if this:
@@ -180,6 +182,7 @@ class Excavation():
         ''' As it says on the tin... '''
         self.busy = False
         self.examine()
+        self.finalize()
 
     def examine(self):
         ''' Explore all artifacts serially '''
@@ -194,18 +197,35 @@ class Excavation():
             this.examined()
         self.busy = False
 
+    def finalize(self):
+        '''
+           Compute the recursive types & (sorted) notes of all artifacts
+
+           Going backwards, children are mostly done before their
+           parents, so the recursion rarely goes deeper than one level.
+        '''
+        for this in reversed(list(self.hashes.values())):
+            this.types_recursive_tuple()
+            this.notes_recursive_tuple()
+            this.sorted_notes()
+
     def polish(self):
         ''' Polish things up before HTML production '''
 
         # Find the shortest unique digest length
         while True:
-            if len({x[:self.digest_prefix] for x in self.hashes}) == len(self.hashes):
+            if len({x.digest[:self.digest_prefix] for x in self.hashes.values()}) == len(self.hashes):
                 break
             self.digest_prefix += 1
 
-        # Reset summaries to pick it up
+        # Reset summaries and derivations to pick it up
         for this in self.hashes.values():
             this.index_representation = None
+            this.derivation = None
+
+    def forget_recursive(self):
+        ''' Duck-type as ArtifactClass '''
+        return
 
     def iter_notes(self):
         ''' Return all notes '''
@@ -276,7 +296,7 @@ class Excavation():
             fo.write("<tr>\n")
             fo.write("<td></td>")
             fo.write('<td style="font-size: 70%;">')
-            fo.write(", ".join(dotdotdot(sorted({y for x, y in this.iter_notes(True)}))))
+            fo.write(", ".join(dotdotdot(this.sorted_notes())))
             fo.write("</td>\n")
             fo.write("</tr>\n")
         fo.write("</table>\n")
@@ -343,7 +363,3 @@ class Excavation():
         ''' Tail of all the HTML pages '''
         fo.write("</body>\n")
         fo.write("</html>\n")
-
-    def html_derivation(self, _fo):
-        ''' Duck-type as ArtifactClass '''
-        return ""
@@ -30,5 +30,4 @@ def hexdump(this, html=True, width=16, prefix=""):
 
 def hexdump_to_file(this, fo, *args, **kwargs):
     ''' Hexdump to a file '''
-    for i in hexdump(this, *args, **kwargs):
-        fo.write(i + "\n")
+    fo.write("".join(i + "\n" for i in hexdump(this, *args, **kwargs)))
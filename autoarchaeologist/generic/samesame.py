@@ -2,13 +2,27 @@
    Artifacts with only one byte value
 '''
 
+import autoarchaeologist.scattergather as scattergather
+
+# Compare this many bytes at a time
+CHUNK = 1 << 16
+
 class SameSame():
     ''' Recognize artifacts with only a single byte value '''
     def __init__(self, this):
         i = this[0]
-        for j in this:
+        # Nearly all artifacts differ within the first few bytes
+        for j in this[:16]:
             if i != j:
                 return
+        pattern = bytes((i,)) * min(len(this), CHUNK)
+        for rec in this.iterrecords():
+            if isinstance(rec, scattergather.ScatterGather):
+                rec = rec.tobytes()
+            for j in range(0, len(rec), CHUNK):
+                part = bytes(rec[j:j + CHUNK])
+                if part != pattern[:len(part)]:
+                    return
 
         self.this = this
         note = "Boring" if this[0] else "Blank"
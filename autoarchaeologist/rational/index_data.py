@@ -99,13 +99,13 @@ class R1K_Index_Data_Class():
                 print("\t", x, y, z.lines[0])
                 print("\t", last[0], last[1], last[2].lines[0])
             if offset < x:
-                a = self.datafile.create(start=offset, stop=x)
+                a = self.datafile.create_slice(offset, x)
                 a.add_note("Gap_0x%x" % (x - offset))
                 self.sl2.append((offset, x - offset, None, a))
             offset = x + y
             last = (x,y,z)
             if y > 0:
-                a = self.datafile.create(start=x, stop=x+y)
+                a = self.datafile.create_slice(x, x+y)
                 fn = z.lines[0].split('.')
                 if fn[-1] not in BLACKLIST and a.digest[:8] not in BLACKLIST:
                     a.add_note(html.escape(z.lines[0]))
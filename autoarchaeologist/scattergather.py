@@ -7,6 +7,13 @@
 '''
 
 import hashlib
+import itertools
+
+def contiguous(buf):
+    ''' Return buf, or a copy if it cannot be handed to hashlib as is '''
+    if isinstance(buf, memoryview) and not buf.c_contiguous:
+        return buf.tobytes()
+    return buf
 
 class ScatterGather():
 
@@ -24,9 +31,7 @@ class ScatterGather():
         return self.length
 
     def __iter__(self):
-        for i in self.sgx:
-            for j in i:
-                yield j
+        return itertools.chain.from_iterable(self.sgx)
 
     def iterrecords(self):
         yield from self.sgx
@@ -65,10 +70,20 @@ class ScatterGather():
         return v
 
     def sha256(self):
+        if len(self.sgx) == 1 and not isinstance(self.sgx[0], ScatterGather):
+            # One contiguous buffer: single call into hashlib
+            return hashlib.sha256(contiguous(self.sgx[0])).digest()
         i = hashlib.sha256()
+        self.sha256_update(i)
+        return i.digest()
+
+    def sha256_update(self, hsh):
+        ''' Feed the records to a hash, copying only non-contiguous ones '''
         for j in self.sgx:
-            i.update(j.tobytes())
-        return i.hexdigest()
+            if isinstance(j, ScatterGather):
+                j.sha256_update(hsh)
+            else:
+                hsh.update(contiguous(j))
 
     def writetofile(self, fd):
         for i in self.sgx:
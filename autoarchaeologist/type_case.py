@@ -58,8 +58,8 @@ class TypeCase():
 
     def hexdump_html(self, that, fo, **kwargs):
         ''' Hexdump into a HTML file '''
-        for i in self.hexdump(that, **kwargs):
-            fo.write(html.escape(i) + "\n")
+        # One write (and one escape) rather than one per line
+        fo.write(html.escape("".join(i + "\n" for i in self.hexdump(that, **kwargs))))
 
 class WellKnown(TypeCase):
     '''
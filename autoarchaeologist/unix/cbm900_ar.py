@@ -23,12 +23,12 @@ class Ar():
         while offset < len(this):
             words = struct.unpack("<14sLHHHHH", this[offset:offset+28])
             name = words[0].rstrip(b'\x00').decode("ASCII")
-            a = this.create(start=offset, stop=offset+28)
+            a = this.create_slice(offset, offset+28)
             a.type = "AR header"
             offset += 28
             i = words[-2] << 16
             i |= words[-1]
-            a = this.create(start=offset, stop=offset+i)
+            a = this.create_slice(offset, offset+i)
             a.add_note("AR member")
             try:
                 a.set_name(this.named + ":" + name)
@@ -212,7 +212,7 @@ class DirEnt():
                 b += i
             if len(b) == 0:
                 return
-            self.artifact = self.ufs.this.create(bits=b)
+            self.artifact = self.ufs.this.create_from_buffer(b)
             self.artifact.add_note("UNIX file")
             try:
                 self.artifact.set_name("/".join(self.path))